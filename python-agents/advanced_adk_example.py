@@ -4,23 +4,33 @@ This demonstrates different approaches to building agents with Python
 """
 
 import asyncio
+import functools
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from fridge_agent_adk import AIResponseService, AptosPaymentService
+
+# Attached once to the "ADK" parent; BaseADKAgent loggers propagate to it
+_LOG_HANDLER = logging.StreamHandler()
+_LOG_HANDLER.setFormatter(
+    logging.Formatter('[%(name)s] %(asctime)s - %(levelname)s - %(message)s')
+)
+logging.getLogger("ADK").addHandler(_LOG_HANDLER)
+
 # =============================================================================
 # FRAMEWORK 1: Custom ADK (like what we built above)
 # =============================================================================
 
-class AgentRole(Enum):
+class AgentRoleKind(Enum):
     BUYER = "buyer"
     SELLER = "seller"
     COORDINATOR = "coordinator"
     OBSERVER = "observer"
 
-@dataclass
+@dataclass(slots=True)
 class AgentCapability:
     name: str
     description: str
@@ -29,7 +39,7 @@ class AgentCapability:
 class BaseADKAgent:
     """Base class for all ADK agents"""
     
-    def __init__(self, name: str, role: AgentRole):
+    def __init__(self, name: str, role: AgentRoleKind):
         self.name = name
         self.role = role
         self.capabilities: List[AgentCapability] = []
@@ -37,24 +47,17 @@ class BaseADKAgent:
         self.state = {}
         
     def _setup_logger(self):
-        logger = logging.getLogger(f"ADK-{self.name}")
+        logger = logging.getLogger(f"ADK.{self.name}")
         logger.setLevel(logging.INFO)
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                f'[ADK-{self.name}] %(asctime)s - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
         return logger
     
     def add_capability(self, capability: AgentCapability):
         self.capabilities.append(capability)
-        self.logger.info(f"Added capability: {capability.name}")
+        self.logger.info("Added capability: %s", capability.name)
     
     async def initialize(self):
         """Initialize the agent"""
-        self.logger.info(f"Initializing {self.role.value} agent: {self.name}")
+        self.logger.info("Initializing %s agent: %s", self.role.value, self.name)
         await self._load_configuration()
         await self._setup_services()
         
@@ -72,7 +75,7 @@ class BaseADKAgent:
     
     async def shutdown(self):
         """Shutdown the agent gracefully"""
-        self.logger.info(f"Shutting down agent: {self.name}")
+        self.logger.info("Shutting down agent: %s", self.name)
 
 # =============================================================================
 # FRAMEWORK 2: LangChain-style Agents (structure example)
@@ -109,15 +112,15 @@ class LangChainStyleAgent:
 # FRAMEWORK 3: CrewAI-style Role-Based Agents (structure example)  
 # =============================================================================
 
-@dataclass
-class AgentRole:
+@dataclass(slots=True, frozen=True)
+class CrewAgentRole:
     """Define an agent's role in the crew"""
     name: str
     goal: str
     backstory: str
-    tools: List[str]
+    tools: Tuple[str, ...]
     
-@dataclass 
+@dataclass(slots=True)
 class Task:
     """Define a task for agents to complete"""
     description: str
@@ -130,7 +133,7 @@ class CrewAIStyleAgent:
     In real implementation, you'd use actual CrewAI classes
     """
     
-    def __init__(self, role: AgentRole):
+    def __init__(self, role: CrewAgentRole):
         self.role = role
         self.tools = []
         self.memory = {}
@@ -145,11 +148,17 @@ class CrewAIStyleAgent:
 # PRACTICAL IMPLEMENTATION: Enhanced Fridge Agent with Multiple Patterns
 # =============================================================================
 
+# Resolved once; the environment doesn't change while the agent runs
+SELLER_ADDRESS = os.getenv("SELLER_ADDRESS")
+
+# Per-unit prices in APT
+BASE_PRICES = {"coke": 0.1, "pepsi": 0.1, "water": 0.05}
+
 class EnhancedFridgeAgent(BaseADKAgent):
     """Fridge agent using advanced ADK patterns"""
     
     def __init__(self):
-        super().__init__("SmartFridge_v2", AgentRole.SELLER)
+        super().__init__("SmartFridge_v2", AgentRoleKind.SELLER)
         
         # Add capabilities
         self.add_capability(AgentCapability(
@@ -174,33 +183,59 @@ class EnhancedFridgeAgent(BaseADKAgent):
         self.inventory = {"coke": 50, "pepsi": 30, "water": 20}
         self.pending_orders = {}
         
+        # Message type -> bound handler, resolved once
+        self._handlers = {
+            "service_request": self._handle_service_request,
+            "inventory_check": self._handle_inventory_check,
+            "payment_verification": self._handle_payment_verification,
+        }
+        
     async def _setup_services(self):
         """Setup required services"""
         # Initialize AI service
-        self.ai_service = AIResponseService()  # From previous example
+        self.ai_service = AIResponseService()
         
         # Initialize payment processor
-        self.payment_service = AptosPaymentService()  # From previous example
+        self.payment_service = AptosPaymentService()
         
         # Initialize inventory manager
         await self._setup_inventory_tracking()
         
     async def _setup_inventory_tracking(self):
         """Setup inventory tracking system"""
-        self.logger.info(f"Inventory status: {self.inventory}")
+        self.logger.info("Inventory status: %s", self.inventory)
         
     async def process_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Process incoming messages using advanced routing"""
         message_type = message.get("type")
-        
-        if message_type == "service_request":
-            return await self._handle_service_request(message)
-        elif message_type == "inventory_check":
-            return await self._handle_inventory_check(message)
-        elif message_type == "payment_verification":
-            return await self._handle_payment_verification(message)
-        else:
-            return {"error": f"Unknown message type: {message_type}"}
+        handler = self._handlers.get(message_type)
+        if handler:
+            return await handler(message)
+        return {"error": f"Unknown message type: {message_type}"}
+    
+    async def _handle_inventory_check(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Report current stock levels"""
+        return {
+            "status": "success",
+            "inventory": dict(self.inventory)
+        }
+    
+    async def _handle_payment_verification(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Verify a payment proof without dispensing anything"""
+        is_valid = await self.payment_service.verify_payment(message.get("payment_proof"))
+        return {
+            "status": "success" if is_valid else "error",
+            "verified": is_valid
+        }
+    
+    @staticmethod
+    def _insufficient_inventory(item: str, available: int) -> Dict[str, Any]:
+        """Error response for an order larger than current stock"""
+        return {
+            "status": "error",
+            "message": f"Insufficient inventory for {item}",
+            "available": available
+        }
     
     async def _handle_service_request(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Handle service requests with advanced logic"""
@@ -209,12 +244,9 @@ class EnhancedFridgeAgent(BaseADKAgent):
         payment_proof = message.get("payment_proof")
         
         # Check inventory
-        if self.inventory.get(requested_item, 0) < quantity:
-            return {
-                "status": "error",
-                "message": f"Insufficient inventory for {requested_item}",
-                "available": self.inventory.get(requested_item, 0)
-            }
+        available = self.inventory.get(requested_item, 0)
+        if available < quantity:
+            return self._insufficient_inventory(requested_item, available)
         
         # Check payment
         if not payment_proof:
@@ -224,14 +256,20 @@ class EnhancedFridgeAgent(BaseADKAgent):
                 "status": "payment_required",
                 "message": ai_message,
                 "price": price,
-                "recipient": os.getenv("SELLER_ADDRESS")
+                "recipient": SELLER_ADDRESS
             }
         
         # Verify payment
         is_valid = await self.payment_service.verify_payment(payment_proof)
         if is_valid:
+            # Other workers may have sold stock while verification awaited;
+            # nothing suspends between this check and the decrement
+            available = self.inventory.get(requested_item, 0)
+            if available < quantity:
+                return self._insufficient_inventory(requested_item, available)
+            
             # Dispense item
-            self.inventory[requested_item] -= quantity
+            self.inventory[requested_item] = available - quantity
             success_message = await self.ai_service.generate_success_message()
             
             return {
@@ -247,10 +285,11 @@ class EnhancedFridgeAgent(BaseADKAgent):
                 "message": "Payment verification failed"
             }
     
-    def _calculate_price(self, item: str, quantity: int) -> float:
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _calculate_price(item: str, quantity: int) -> float:
         """Calculate price based on item and quantity"""
-        base_prices = {"coke": 0.1, "pepsi": 0.1, "water": 0.05}
-        return base_prices.get(item, 0.1) * quantity
+        return BASE_PRICES.get(item, 0.1) * quantity
 
 # =============================================================================
 # MULTI-AGENT ORCHESTRATION SYSTEM
@@ -259,40 +298,47 @@ class EnhancedFridgeAgent(BaseADKAgent):
 class AgentOrchestrator:
     """Orchestrates multiple agents working together"""
     
+    NUM_WORKERS = 8      # Messages routed concurrently
+    MAX_QUEUED = 1000    # send_message waits once this many are pending
+    DRAIN_TIMEOUT = 10   # Seconds shutdown waits for queued messages
+    
     def __init__(self):
         self.agents = {}
-        self.message_queue = asyncio.Queue()
+        self.message_queue = asyncio.Queue(maxsize=self.MAX_QUEUED)
         self.running = False
+        self._workers = []
         self.logger = logging.getLogger("Orchestrator")
         
     def register_agent(self, agent: BaseADKAgent):
         """Register an agent with the orchestrator"""
         self.agents[agent.name] = agent
-        self.logger.info(f"Registered agent: {agent.name} ({agent.role.value})")
+        self.logger.info("Registered agent: %s (%s)", agent.name, agent.role.value)
         
     async def start(self):
         """Start the orchestration system"""
         self.logger.info("Starting agent orchestration system...")
         self.running = True
         
-        # Initialize all agents
-        for agent in self.agents.values():
-            await agent.initialize()
+        # Initialize all agents concurrently
+        await asyncio.gather(*(agent.initialize() for agent in self.agents.values()))
             
-        # Start message processing loop
-        await self._process_messages()
+        # Start a fixed pool of message workers
+        self._workers = [
+            asyncio.create_task(self._process_messages())
+            for _ in range(self.NUM_WORKERS)
+        ]
+        await asyncio.gather(*self._workers, return_exceptions=True)
         
     async def _process_messages(self):
-        """Process messages between agents"""
+        """Worker loop: route queued messages one at a time"""
         while self.running:
+            message = await self.message_queue.get()
             try:
-                # Get message from queue (with timeout)
-                message = await asyncio.wait_for(self.message_queue.get(), timeout=1.0)
                 await self._route_message(message)
-            except asyncio.TimeoutError:
-                continue  # Continue processing
             except Exception as e:
-                self.logger.error(f"Error processing message: {e}")
+                self.logger.error("Error processing message: %s", e)
+            finally:
+                self.message_queue.task_done()
                 
     async def _route_message(self, message: Dict[str, Any]):
         """Route message to appropriate agent"""
@@ -300,10 +346,10 @@ class AgentOrchestrator:
         if recipient in self.agents:
             agent = self.agents[recipient]
             response = await agent.process_message(message)
-            if response:
-                self.logger.info(f"Agent {recipient} responded: {response}")
+            if response and self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Agent %s responded: %s", recipient, response)
         else:
-            self.logger.warning(f"No agent found for recipient: {recipient}")
+            self.logger.warning("No agent found for recipient: %s", recipient)
             
     async def send_message(self, message: Dict[str, Any]):
         """Send a message through the orchestrator"""
@@ -312,10 +358,25 @@ class AgentOrchestrator:
     async def shutdown(self):
         """Shutdown all agents gracefully"""
         self.logger.info("Shutting down orchestration system...")
+        
+        # Let in-flight and queued messages finish before the workers go away
+        if self._workers:
+            try:
+                await asyncio.wait_for(self.message_queue.join(), self.DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    "Shutdown timed out with %d messages still queued", self.message_queue.qsize()
+                )
         self.running = False
         
-        for agent in self.agents.values():
-            await agent.shutdown()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        
+        await asyncio.gather(
+            *(agent.shutdown() for agent in self.agents.values()),
+            return_exceptions=True
+        )
 
 # =============================================================================
 # DEMO AND TESTING SYSTEM
@@ -414,4 +475,9 @@ async def main():
     print("   • Multi-agent coordination and collaboration")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -5,18 +5,41 @@ This demonstrates how to build agents using established Python frameworks
 """
 
 import asyncio
+import functools
 import os
+import itertools
 import json
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, Optional
+import random
+import re
+import signal
+import time
+from types import MappingProxyType
+from dataclasses import dataclass
+from typing import Dict, Any, List, Mapping, Optional, Tuple, ValuesView
 from datetime import datetime
 import aiohttp
 from aiohttp import web
 import logging
 
+# Agent loggers are children of "Agent", so this one handler serves them all;
+# the display name comes from each agent's LoggerAdapter
+_LOG_HANDLER = logging.StreamHandler()
+_LOG_HANDLER.setFormatter(logging.Formatter(
+    '[%(agent)s] %(asctime)s - %(levelname)s - %(message)s',
+    defaults={"agent": "Agent"}
+))
+logging.getLogger("Agent").addHandler(_LOG_HANDLER)
+
 # ADK-style base classes (simplified version of frameworks like uAgents, autogen, etc.)
 
-@dataclass
+def message_handler(message_type: str):
+    """Mark an Agent method as the handler for a message type"""
+    def decorator(fn):
+        fn._message_type = message_type
+        return fn
+    return decorator
+
+@dataclass(slots=True)
 class Message:
     """Standard message format for agent communication"""
     id: str
@@ -24,64 +47,74 @@ class Message:
     recipient_id: str
     message_type: str
     content: Dict[str, Any]
-    timestamp: str = None
+    timestamp: int = 0  # Nanoseconds since the epoch
     
     def __post_init__(self):
         if not self.timestamp:
-            self.timestamp = datetime.now().isoformat()
+            self.timestamp = time.time_ns()
+    
+    @property
+    def timestamp_iso(self) -> str:
+        """Timestamp as an ISO 8601 string, formatted on demand"""
+        return datetime.fromtimestamp(self.timestamp / 1e9).isoformat()
 
 class Agent:
     """Base Agent class following ADK patterns"""
     
+    _id_counter = itertools.count(1)  # Message ids, unique per process
+    _handlers: Dict[str, str] = {}  # Message type -> handler method name, per class
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Inherit parent handlers, then add the ones this class declares
+        handlers = dict(cls._handlers)
+        for name, attr in vars(cls).items():
+            message_type = getattr(attr, "_message_type", None)
+            if message_type:
+                handlers[message_type] = name
+        cls._handlers = handlers
+    
     def __init__(self, agent_id: str, name: str, description: str):
         self.agent_id = agent_id
         self.name = name
         self.description = description
         self.capabilities = []
-        self.message_handlers = {}
         self.logger = self._setup_logger()
         
     def _setup_logger(self):
-        logger = logging.getLogger(f"Agent-{self.agent_id}")
+        logger = logging.getLogger(f"Agent.{self.agent_id}")
         logger.setLevel(logging.INFO)
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                f'[{self.name}] %(asctime)s - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
-        return logger
+        return logging.LoggerAdapter(logger, {"agent": self.name})
         
     def add_capability(self, capability: str):
         """Add a capability to this agent"""
         self.capabilities.append(capability)
         
-    def register_handler(self, message_type: str, handler):
-        """Register a message handler for specific message types"""
-        self.message_handlers[message_type] = handler
-        
     async def handle_message(self, message: Message) -> Optional[Message]:
-        """Handle incoming messages based on registered handlers"""
-        handler = self.message_handlers.get(message.message_type)
-        if handler:
-            return await handler(message)
+        """Handle incoming messages based on the class handler table"""
+        # Looked up by name so subclass overrides are honored without re-decorating
+        handler_name = self._handlers.get(message.message_type)
+        if handler_name:
+            return await getattr(self, handler_name)(message)
         else:
-            self.logger.warning(f"No handler for message type: {message.message_type}")
+            self.logger.warning("No handler for message type: %s", message.message_type)
             return None
             
     async def send_message(self, recipient_id: str, message_type: str, content: Dict[str, Any]) -> Message:
         """Send a message to another agent"""
         message = Message(
-            id=f"msg_{datetime.now().timestamp()}",
+            id=f"msg_{next(Agent._id_counter)}",
             sender_id=self.agent_id,
             recipient_id=recipient_id,
             message_type=message_type,
             content=content
         )
-        self.logger.info(f"Sending {message_type} to {recipient_id}")
+        self.logger.info("Sending %s to %s", message_type, recipient_id)
         return message
 
+# Aptos transaction hashes: 0x followed by 32 bytes of hex
+_TX_HASH_RE = re.compile(r"0x[0-9a-fA-F]{64}")
+
 # Blockchain Integration (using your Aptos setup)
 class AptosPaymentService:
     """Service for handling Aptos blockchain payments"""
@@ -90,22 +123,44 @@ class AptosPaymentService:
         self.network = network
         self.service_price = 0.1  # APT
         self.seller_address = os.getenv("SELLER_ADDRESS")
+        # Price, recipient and network are fixed after init, so build once;
+        # read-only because every caller shares the same mapping (copy it with
+        # dict() before embedding it in a message)
+        self._payment_info = MappingProxyType({
+            "price": self.service_price,
+            "currency": "APT",
+            "recipient": self.seller_address,
+            "network": self.network
+        })
         
     async def verify_payment(self, tx_hash: str) -> bool:
         """Verify payment transaction on Aptos blockchain"""
         # This would integrate with Aptos SDK
-        # For demo purposes, we'll simulate verification
-        if tx_hash and tx_hash.startswith("0x") and len(tx_hash) > 10:
-            return True
-        return False
+        # For demo purposes, we'll simulate verification; malformed hashes
+        # are rejected here so a real lookup never sees them
+        return bool(tx_hash) and _TX_HASH_RE.fullmatch(tx_hash) is not None
         
-    def get_payment_info(self) -> Dict[str, Any]:
-        return {
-            "price": self.service_price,
-            "currency": "APT",
-            "recipient": self.seller_address,
-            "network": self.network
-        }
+    def get_payment_info(self) -> Mapping[str, Any]:
+        return self._payment_info
+
+# Payment prompts, indexed by price in hundredths of an APT
+_PAY_RESPONSES = (
+    "🤖 Hey there! I'd love to help you with that soda, but I need a payment of {price} APT first. Thanks!",
+    "💰 Payment required: {price} APT for your refreshing soda. Please complete the payment to proceed!",
+    "🥤 I've got ice-cold sodas ready! Just need {price} APT to dispense one for you."
+)
+
+_SUCCESS_RESPONSES = (
+    "🎉 Payment verified! Here's your ice-cold soda. Enjoy this refreshing treat!",
+    "✅ Soda dispensed successfully! Stay hydrated and have a great day!",
+    "🥤 Fizzy goodness coming right up! Thanks for your payment - enjoy!"
+)
+
+@functools.lru_cache(maxsize=256, typed=True)
+def _payment_request_text(price: float) -> str:
+    """Payment prompt for a price; bounded since prices can come from messages"""
+    template = _PAY_RESPONSES[int(price * 100) % len(_PAY_RESPONSES)]
+    return template.format(price=price)
 
 # AI Service Integration (using Google Gemini)
 class AIResponseService:
@@ -117,22 +172,11 @@ class AIResponseService:
     async def generate_payment_request(self, price: float) -> str:
         """Generate AI-powered payment request message"""
         # In a real implementation, this would call Google Gemini API
-        responses = [
-            f"🤖 Hey there! I'd love to help you with that soda, but I need a payment of {price} APT first. Thanks!",
-            f"💰 Payment required: {price} APT for your refreshing soda. Please complete the payment to proceed!",
-            f"🥤 I've got ice-cold sodas ready! Just need {price} APT to dispense one for you."
-        ]
-        return responses[hash(str(price)) % len(responses)]
+        return _payment_request_text(price)
         
     async def generate_success_message(self) -> str:
         """Generate AI-powered success message"""
-        responses = [
-            "🎉 Payment verified! Here's your ice-cold soda. Enjoy this refreshing treat!",
-            "✅ Soda dispensed successfully! Stay hydrated and have a great day!",
-            "🥤 Fizzy goodness coming right up! Thanks for your payment - enjoy!"
-        ]
-        import random
-        return random.choice(responses)
+        return random.choice(_SUCCESS_RESPONSES)
 
 # The Fridge Agent Implementation
 class FridgeAgent(Agent):
@@ -154,10 +198,10 @@ class FridgeAgent(Agent):
         self.payment_service = AptosPaymentService()
         self.ai_service = AIResponseService()
         
-        # Register message handlers
-        self.register_handler("service_request", self.handle_service_request)
-        
         # Web server for HTTP API
+        self._payment_required_body: Tuple[Optional[str], bytes] = (None, b"")
+        self._status_body: Optional[bytes] = None
+        self._runner: Optional[web.AppRunner] = None
         self.app = web.Application()
         self._setup_routes()
         
@@ -166,6 +210,12 @@ class FridgeAgent(Agent):
         self.app.router.add_get('/api/dispense/soda', self.http_dispense_soda)
         self.app.router.add_get('/api/status', self.http_status)
         
+    def add_capability(self, capability: str):
+        """Add a capability, dropping the cached status body that lists them"""
+        super().add_capability(capability)
+        self._status_body = None
+        
+    @message_handler("service_request")
     async def handle_service_request(self, message: Message) -> Message:
         """Handle service requests from other agents"""
         service = message.content.get("service")
@@ -181,7 +231,7 @@ class FridgeAgent(Agent):
                 message_type="payment_required",
                 content={
                     "message": ai_message,
-                    "payment_info": payment_info
+                    "payment_info": dict(payment_info)  # Message content must stay serializable
                 }
             )
         else:
@@ -214,13 +264,21 @@ class FridgeAgent(Agent):
             payment_info = self.payment_service.get_payment_info()
             ai_message = await self.ai_service.generate_payment_request(payment_info["price"])
             
-            return web.json_response(
-                {
+            # Price and recipient are fixed; re-encode only when the message changes
+            cached_message, body = self._payment_required_body
+            if ai_message != cached_message:
+                body = json.dumps({
                     "message": ai_message,
                     "price": payment_info["price"],
                     "recipient": payment_info["recipient"]
-                },
-                status=402
+                }).encode()
+                self._payment_required_body = (ai_message, body)
+            
+            return web.Response(
+                body=body,
+                status=402,
+                content_type="application/json",
+                charset="utf-8"
             )
         else:
             is_valid = await self.payment_service.verify_payment(payment_proof)
@@ -235,22 +293,33 @@ class FridgeAgent(Agent):
     
     async def http_status(self, request):
         """HTTP endpoint for agent status"""
-        return web.json_response({
-            "agent_id": self.agent_id,
-            "name": self.name,
-            "description": self.description,
-            "capabilities": self.capabilities,
-            "status": "active"
-        })
+        # Encoded on first hit; add_capability clears it when the list changes
+        if self._status_body is None:
+            self._status_body = json.dumps({
+                "agent_id": self.agent_id,
+                "name": self.name,
+                "description": self.description,
+                "capabilities": self.capabilities,
+                "status": "active"
+            }).encode()
+        return web.Response(body=self._status_body, content_type="application/json", charset="utf-8")
     
     async def start_server(self, host="localhost", port=3001):
         """Start the HTTP server"""
-        self.logger.info(f"🌐 Starting Fridge Agent server on http://{host}:{port}")
-        runner = web.AppRunner(self.app)
+        self.logger.info("🌐 Starting Fridge Agent server on http://%s:%s", host, port)
+        # Skip per-request access log formatting; agent events are logged explicitly
+        runner = web.AppRunner(self.app, access_log=None)
         await runner.setup()
-        site = web.TCPSite(runner, host, port)
+        site = web.TCPSite(runner, host, port, backlog=2048)
         await site.start()
+        self._runner = runner
         self.logger.info("✅ Fridge Agent server started successfully")
+        
+    async def stop_server(self):
+        """Stop the HTTP server if it is running"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
 
 # Agent Registry (ADK pattern for agent discovery)
 class AgentRegistry:
@@ -267,8 +336,12 @@ class AgentRegistry:
         """Get an agent by ID"""
         return self.agents.get(agent_id)
         
-    def list_agents(self):
-        """List all registered agents"""
+    def list_agents(self) -> ValuesView[Agent]:
+        """List all registered agents (live view, reflects later registrations)"""
+        return self.agents.values()
+        
+    def list_agents_snapshot(self) -> List[Agent]:
+        """List all registered agents as a copy, safe to hold while registering"""
         return list(self.agents.values())
 
 # Main execution
@@ -293,12 +366,23 @@ async def main():
     print(f"🌐 HTTP API: http://localhost:3001")
     print("===============================================================")
     
-    # Keep the server running
-    try:
-        while True:
-            await asyncio.sleep(1)
-    except KeyboardInterrupt:
-        print("\n🛑 Shutting down Fridge Agent...")
+    # Keep the server running until SIGINT/SIGTERM
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    await stop.wait()
+    
+    print("\n🛑 Shutting down Fridge Agent...")
+    await fridge_agent.stop_server()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
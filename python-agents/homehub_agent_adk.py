@@ -5,16 +5,58 @@ This demonstrates autonomous agent behavior with decision-making capabilities
 """
 
 import asyncio
+import functools
+import hashlib
+import itertools
 import os
-import json
+import random
+import time
+from collections import deque
 import aiohttp
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, Optional
-from datetime import datetime
+from yarl import URL
+from dataclasses import dataclass
+from typing import Deque, Dict, Any, List, Optional, Tuple, Union
 import logging
 
 # Import base classes from fridge_agent_adk (in real ADK, these would be separate modules)
-from fridge_agent_adk import Agent, Message
+from fridge_agent_adk import Agent, Message, message_handler
+
+# Parsed once; aiohttp uses a URL object as-is instead of re-parsing a string
+FRIDGE_SODA_URL = URL("http://localhost:3001/api/dispense/soda")
+
+# A hung Fridge Agent must not stall the autonomous loop; failed GETs are
+# retried with exponential backoff starting at HTTP_BACKOFF seconds
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=5, connect=1, sock_read=3)
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.2
+# Any failure of the unpaid probe is safe to retry
+RETRY_ANY = (asyncio.TimeoutError, aiohttp.ClientError)
+# A request carrying payment proof may already have been served when it
+# times out, so only retry it if the connection was never made
+RETRY_UNSENT = (aiohttp.ClientConnectorError,)
+
+# Message templates, filled in with the service name
+_REQUEST_TEMPLATES = (
+    "🏠 Hi there! I'd like to request {service} service. Can you help me?",
+    "🤖 Hello! I need {service}. What do I need to do to get it?",
+    "👋 Good day! I'm interested in your {service} service. Please let me know how to proceed."
+)
+
+_SUCCESS_TEMPLATES = (
+    "🎉 Perfect! Successfully obtained {service}. Mission accomplished!",
+    "✅ Great! The {service} transaction completed successfully. Very satisfied!",
+    "🌟 Excellent! {service} acquired as planned. Everything went smoothly!"
+)
+
+@functools.lru_cache(maxsize=256, typed=True)
+def _purchase_decision(service: str, price: float, threshold: float) -> Tuple[bool, str, float]:
+    """Budget decision, reasoning and confidence; pure, so repeat quotes are cached"""
+    decision = price <= threshold
+    reasoning = (
+        f"💭 The price of {price} APT for {service} is {'acceptable' if decision else 'too expensive'}. "
+        f"My budget threshold is {threshold} APT."
+    )
+    return decision, reasoning, 0.85 if decision else 0.95
 
 # AI Decision Making Service
 class AIDecisionService:
@@ -23,41 +65,34 @@ class AIDecisionService:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.decision_threshold = 1.0  # Maximum price willing to pay in APT
+        self._request_messages: Dict[str, str] = {}  # service -> request message
+        self._success_turn = itertools.count()  # Rotates through success messages
         
-    async def should_purchase(self, service: str, price: float) -> Dict[str, Any]:
+    def should_purchase(self, service: str, price: float) -> Dict[str, Any]:
         """AI decides whether to purchase a service"""
         # In a real implementation, this would use Gemini API for complex decisions
-        decision = price <= self.decision_threshold
-        
-        reasoning = (
-            f"💭 The price of {price} APT for {service} is {'acceptable' if decision else 'too expensive'}. "
-            f"My budget threshold is {self.decision_threshold} APT."
+        decision, reasoning, confidence = _purchase_decision(
+            service, price, self.decision_threshold
         )
-        
         return {
             "decision": decision,
             "reasoning": reasoning,
-            "confidence": 0.85 if decision else 0.95
+            "confidence": confidence
         }
     
-    async def generate_request_message(self, service: str) -> str:
+    def generate_request_message(self, service: str) -> str:
         """Generate a natural request message"""
-        requests = [
-            f"🏠 Hi there! I'd like to request {service} service. Can you help me?",
-            f"🤖 Hello! I need {service}. What do I need to do to get it?",
-            f"👋 Good day! I'm interested in your {service} service. Please let me know how to proceed."
-        ]
-        return requests[hash(service) % len(requests)]
+        message = self._request_messages.get(service)
+        if message is None:
+            # Each new service gets the next template in turn
+            template = _REQUEST_TEMPLATES[len(self._request_messages) % len(_REQUEST_TEMPLATES)]
+            message = self._request_messages[service] = template.format(service=service)
+        return message
     
-    async def generate_success_message(self, service: str) -> str:
+    def generate_success_message(self, service: str) -> str:
         """Generate success confirmation message"""
-        messages = [
-            f"🎉 Perfect! Successfully obtained {service}. Mission accomplished!",
-            f"✅ Great! The {service} transaction completed successfully. Very satisfied!",
-            f"🌟 Excellent! {service} acquired as planned. Everything went smoothly!"
-        ]
-        import random
-        return random.choice(messages)
+        template = _SUCCESS_TEMPLATES[next(self._success_turn) % len(_SUCCESS_TEMPLATES)]
+        return template.format(service=service)
 
 # Blockchain Payment Service (for HomeHub as buyer)
 class AptosPaymentClient:
@@ -66,14 +101,21 @@ class AptosPaymentClient:
     def __init__(self):
         self.private_key = os.getenv("BUYER_PRIVATE_KEY")
         self.network = "devnet"
+        # Derived from config that doesn't change after init
+        self._wallet_info = {
+            "network": self.network,
+            "has_private_key": bool(self.private_key),
+            "supported_currencies": ("APT",)
+        }
         
     async def make_payment(self, amount: float, recipient: str) -> Dict[str, Any]:
         """Make a payment transaction"""
         # In a real implementation, this would use Aptos SDK
         # For demo purposes, we simulate a successful transaction
         if self.private_key and recipient:
-            # Simulate transaction hash
-            tx_hash = f"0x{''.join(f'{ord(c):02x}' for c in f'{amount}{recipient}{datetime.now().timestamp()}')[:64]}"
+            # Simulate transaction hash (32 bytes, like a real Aptos hash)
+            payload = f"{amount}{recipient}{time.time_ns()}".encode()
+            tx_hash = "0x" + hashlib.blake2b(payload, digest_size=32).hexdigest()
             
             return {
                 "success": True,
@@ -90,11 +132,13 @@ class AptosPaymentClient:
     
     def get_wallet_info(self) -> Dict[str, Any]:
         """Get wallet information"""
-        return {
-            "network": self.network,
-            "has_private_key": bool(self.private_key),
-            "supported_currencies": ["APT"]
-        }
+        return self._wallet_info
+
+@dataclass(slots=True)
+class Transaction:
+    """A service exchange open with another agent"""
+    service: str
+    payment_hash: Optional[str] = None
 
 # The HomeHub Agent Implementation
 class HomeHubAgent(Agent):
@@ -117,26 +161,69 @@ class HomeHubAgent(Agent):
         self.ai_service = AIDecisionService()
         self.payment_client = AptosPaymentClient()
         
-        # Register message handlers
-        self.register_handler("payment_required", self.handle_payment_required)
-        self.register_handler("service_delivered", self.handle_service_delivered)
-        self.register_handler("payment_invalid", self.handle_payment_invalid)
+        # Task queue for autonomous operations: pending (endpoint, service)
+        # requests, oldest dropped past maxlen, plus a wakeup for the worker
+        self.task_queue: Deque[Tuple[Union[str, URL], str]] = deque(maxlen=100)
+        self._task_ready = asyncio.Event()
         
-        # Task queue for autonomous operations
-        self.task_queue = asyncio.Queue()
-        self.active_transactions = {}
+        # Set and notified when something decides a service is needed
+        self._need_trigger = asyncio.Condition()
+        self._service_needed = False
+        self.active_transactions: Dict[str, Transaction] = {}
         
+        # HTTP client, shared so keep-alive connections and DNS lookups are reused
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+    def _service_for(self, sender_id: str, default: str) -> str:
+        """Service name of the transaction open with sender_id, if any"""
+        transaction = self.active_transactions.get(sender_id)
+        return transaction.service if transaction else default
+        
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=HTTP_TIMEOUT,
+                connector=aiohttp.TCPConnector(
+                    limit=64, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=30
+                )
+            )
+        return self._session
+        
+    async def _get_json(self, url: Union[str, URL], headers: Optional[Dict[str, str]] = None,
+                        retry_on: Tuple[type, ...] = RETRY_ANY) -> Tuple[int, Any]:
+        """GET a URL on the shared session, returning (status, JSON body or None)"""
+        session = await self._get_session()
+        for attempt in range(HTTP_RETRIES):
+            try:
+                async with session.get(url, headers=headers) as response:
+                    body = await response.json() if response.content_type == "application/json" else None
+                    return response.status, body
+            except retry_on as e:
+                if attempt == HTTP_RETRIES - 1:
+                    raise
+                delay = HTTP_BACKOFF * 2 ** attempt
+                self.logger.warning("⏳ GET %s failed (%s), retrying in %.1fs", url, e, delay)
+                await asyncio.sleep(delay)
+        
+    async def close(self):
+        """Release the shared HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        
+    @message_handler("payment_required")
     async def handle_payment_required(self, message: Message) -> Optional[Message]:
         """Handle payment requests from service providers"""
         payment_info = message.content.get("payment_info", {})
         price = payment_info.get("price", 0)
         recipient = payment_info.get("recipient")
-        service_name = self.active_transactions.get(message.sender_id, {}).get("service", "unknown service")
+        service_name = self._service_for(message.sender_id, "unknown service")
         
-        self.logger.info(f"💳 Payment required: {price} APT for {service_name}")
+        self.logger.info("💳 Payment required: %s APT for %s", price, service_name)
         
         # Use AI to decide whether to pay
-        decision_info = await self.ai_service.should_purchase(service_name, price)
+        decision_info = self.ai_service.should_purchase(service_name, price)
         self.logger.info(decision_info["reasoning"])
         
         if decision_info["decision"]:
@@ -144,12 +231,13 @@ class HomeHubAgent(Agent):
             payment_result = await self.payment_client.make_payment(price, recipient)
             
             if payment_result["success"]:
-                self.logger.info(f"✅ Payment successful: {payment_result['transaction_hash']}")
+                self.logger.info("✅ Payment successful: %s", payment_result['transaction_hash'])
                 
                 # Store transaction info
-                if message.sender_id not in self.active_transactions:
-                    self.active_transactions[message.sender_id] = {}
-                self.active_transactions[message.sender_id]["payment_hash"] = payment_result["transaction_hash"]
+                transaction = self.active_transactions.setdefault(
+                    message.sender_id, Transaction(service=service_name)
+                )
+                transaction.payment_hash = payment_result["transaction_hash"]
                 
                 # Send service request with payment proof
                 return await self.send_message(
@@ -161,7 +249,7 @@ class HomeHubAgent(Agent):
                     }
                 )
             else:
-                self.logger.error(f"❌ Payment failed: {payment_result.get('error')}")
+                self.logger.error("❌ Payment failed: %s", payment_result.get('error'))
                 return None
         else:
             self.logger.info("🚫 AI decided not to purchase - price too high")
@@ -174,26 +262,27 @@ class HomeHubAgent(Agent):
                 }
             )
     
+    @message_handler("service_delivered")
     async def handle_service_delivered(self, message: Message) -> Optional[Message]:
         """Handle successful service delivery"""
         service_status = message.content.get("status", "Service delivered")
-        self.logger.info(f"🎉 Service delivered: {service_status}")
+        self.logger.info("🎉 Service delivered: %s", service_status)
         
         # Generate AI success message
-        service_name = self.active_transactions.get(message.sender_id, {}).get("service", "service")
-        success_msg = await self.ai_service.generate_success_message(service_name)
+        service_name = self._service_for(message.sender_id, "service")
+        success_msg = self.ai_service.generate_success_message(service_name)
         self.logger.info(success_msg)
         
         # Clean up transaction tracking
-        if message.sender_id in self.active_transactions:
-            del self.active_transactions[message.sender_id]
+        self.active_transactions.pop(message.sender_id, None)
             
         return None  # Transaction complete
     
+    @message_handler("payment_invalid")
     async def handle_payment_invalid(self, message: Message) -> Optional[Message]:
         """Handle payment validation failures"""
         error = message.content.get("error", "Payment verification failed")
-        self.logger.error(f"❌ Payment issue: {error}")
+        self.logger.error("❌ Payment issue: %s", error)
         
         # Could implement retry logic here
         return None
@@ -203,11 +292,11 @@ class HomeHubAgent(Agent):
         try:
             # Store transaction context
             agent_id = f"agent_{hash(agent_endpoint) % 10000}"
-            self.active_transactions[agent_id] = {"service": service}
+            self.active_transactions[agent_id] = Transaction(service=service)
             
             # Generate AI request message
-            request_msg = await self.ai_service.generate_request_message(service)
-            self.logger.info(f"🤖 {request_msg}")
+            request_msg = self.ai_service.generate_request_message(service)
+            self.logger.info("🤖 %s", request_msg)
             
             # Send initial service request
             await self.send_message(
@@ -220,90 +309,117 @@ class HomeHubAgent(Agent):
             )
             
         except Exception as e:
-            self.logger.error(f"Failed to request service: {e}")
+            self.logger.error("Failed to request service: %s", e)
     
-    async def request_service_via_http(self, endpoint_url: str, service: str = "soda"):
+    async def request_service_via_http(self, endpoint_url: Union[str, URL], service: str = "soda"):
         """Request a service via HTTP API (compatible with your current setup)"""
         try:
-            self.logger.info(f"🌐 Requesting {service} from {endpoint_url}")
+            self.logger.info("🌐 Requesting %s from %s", service, endpoint_url)
             
             # Generate AI request message
-            request_msg = await self.ai_service.generate_request_message(service)
-            self.logger.info(f"🤖 {request_msg}")
+            request_msg = self.ai_service.generate_request_message(service)
+            self.logger.info("🤖 %s", request_msg)
             
-            async with aiohttp.ClientSession() as session:
-                # First request without payment
-                async with session.get(endpoint_url) as response:
-                    if response.status == 402:  # Payment required
-                        payment_info = await response.json()
-                        self.logger.info(f"💳 Payment required: {payment_info}")
+            # First request without payment
+            status, body = await self._get_json(endpoint_url)
+            if status == 402:  # Payment required
+                payment_info = body
+                self.logger.info("💳 Payment required: %s", payment_info)
+                
+                # Use AI to decide on payment
+                decision_info = self.ai_service.should_purchase(
+                    service, payment_info.get("price", 0)
+                )
+                self.logger.info(decision_info["reasoning"])
+                
+                if decision_info["decision"]:
+                    # Make payment
+                    payment_result = await self.payment_client.make_payment(
+                        payment_info["price"], 
+                        payment_info["recipient"]
+                    )
+                    
+                    if payment_result["success"]:
+                        self.logger.info("✅ Payment sent: %s", payment_result['transaction_hash'])
                         
-                        # Use AI to decide on payment
-                        decision_info = await self.ai_service.should_purchase(
-                            service, payment_info.get("price", 0)
+                        # Retry request with payment proof
+                        headers = {"x-payment-proof": payment_result["transaction_hash"]}
+                        retry_status, result = await self._get_json(
+                            endpoint_url, headers=headers, retry_on=RETRY_UNSENT
                         )
-                        self.logger.info(decision_info["reasoning"])
-                        
-                        if decision_info["decision"]:
-                            # Make payment
-                            payment_result = await self.payment_client.make_payment(
-                                payment_info["price"], 
-                                payment_info["recipient"]
-                            )
-                            
-                            if payment_result["success"]:
-                                self.logger.info(f"✅ Payment sent: {payment_result['transaction_hash']}")
-                                
-                                # Retry request with payment proof
-                                headers = {"x-payment-proof": payment_result["transaction_hash"]}
-                                async with session.get(endpoint_url, headers=headers) as retry_response:
-                                    if retry_response.status == 200:
-                                        result = await retry_response.json()
-                                        success_msg = await self.ai_service.generate_success_message(service)
-                                        self.logger.info(f"🎉 {success_msg}")
-                                        self.logger.info(f"📦 Service response: {result.get('status')}")
-                                    else:
-                                        self.logger.error(f"❌ Service request failed: {retry_response.status}")
-                            else:
-                                self.logger.error(f"❌ Payment failed: {payment_result.get('error')}")
+                        if retry_status == 200:
+                            success_msg = self.ai_service.generate_success_message(service)
+                            self.logger.info("🎉 %s", success_msg)
+                            self.logger.info("📦 Service response: %s", result.get('status'))
                         else:
-                            self.logger.info("🚫 AI declined to purchase - budget exceeded")
+                            self.logger.error("❌ Service request failed: %s", retry_status)
                     else:
-                        # Service available without payment
-                        result = await response.json()
-                        self.logger.info(f"🎉 Service obtained: {result}")
-                        
+                        self.logger.error("❌ Payment failed: %s", payment_result.get('error'))
+                else:
+                    self.logger.info("🚫 AI declined to purchase - budget exceeded")
+            else:
+                # Service available without payment
+                self.logger.info("🎉 Service obtained: %s", body)
+                
         except Exception as e:
-            self.logger.error(f"Failed to request service via HTTP: {e}")
+            self.logger.error("Failed to request service via HTTP: %s", e)
     
-    async def start_autonomous_mode(self):
-        """Start autonomous operation mode"""
+    async def start_autonomous_mode(self, simulate_demand: bool = False):
+        """Start autonomous operation mode; simulate_demand adds random soda needs for demos"""
         self.logger.info("🚀 Starting autonomous mode...")
         
-        # Example autonomous task: regularly check for soda availability
+        # The watcher decides what to buy, the queue worker does the buying;
+        # cancelling this coroutine cancels all of them
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._watch_for_needs())
+                tg.create_task(self._process_queue())
+                if simulate_demand:
+                    tg.create_task(self._simulate_demand())
+        except asyncio.CancelledError:
+            self.logger.info("🛑 Stopping autonomous mode")
+            raise
+    
+    async def signal_service_needed(self):
+        """Wake autonomous mode because a service is needed"""
+        async with self._need_trigger:
+            self._service_needed = True
+            self._need_trigger.notify_all()
+    
+    async def _watch_for_needs(self):
+        """Sleep until something signals a need, then request the service"""
         while True:
-            try:
-                await asyncio.sleep(10)  # Wait 10 seconds between checks
-                
-                # Autonomous decision: do I need a soda?
-                if len(self.active_transactions) == 0:  # No pending transactions
-                    self.logger.info("🤔 Checking if I need any services...")
-                    
-                    # In a real implementation, this could be based on schedules,
-                    # sensor data, user preferences, etc.
-                    import random
-                    if random.random() < 0.1:  # 10% chance to request service
-                        await self.request_service_via_http(
-                            "http://localhost:3001/api/dispense/soda", 
-                            "soda"
-                        )
-                        
-            except KeyboardInterrupt:
-                self.logger.info("🛑 Stopping autonomous mode")
-                break
-            except Exception as e:
-                self.logger.error(f"Error in autonomous mode: {e}")
-                await asyncio.sleep(5)  # Wait before retrying
+            async with self._need_trigger:
+                await self._need_trigger.wait_for(lambda: self._service_needed)
+                self._service_needed = False
+            
+            # Autonomous decision: do I need a soda?
+            if len(self.active_transactions) == 0:  # No pending transactions
+                self.logger.info("🤔 Checking if I need any services...")
+                self.enqueue_service_request(FRIDGE_SODA_URL, "soda")
+    
+    async def _simulate_demand(self):
+        """Stand-in for real triggers: need a soda about every 100 seconds"""
+        # In a real implementation, signal_service_needed() would be called
+        # from schedules, sensor data, user preferences, etc.
+        while True:
+            await asyncio.sleep(random.expovariate(1 / 100))
+            await self.signal_service_needed()
+    
+    def enqueue_service_request(self, endpoint_url: Union[str, URL], service: str):
+        """Queue a service request for the autonomous worker"""
+        self.task_queue.append((endpoint_url, service))
+        self._task_ready.set()
+    
+    async def _process_queue(self):
+        """Run queued service requests one at a time"""
+        while True:
+            await self._task_ready.wait()
+            while self.task_queue:
+                endpoint_url, service = self.task_queue.popleft()
+                await self.request_service_via_http(endpoint_url, service)
+            # No await since the emptiness check, so nothing can slip in here
+            self._task_ready.clear()
 
 # Task Management System
 class TaskManager:
@@ -313,21 +429,32 @@ class TaskManager:
         self.agent = agent
         self.scheduled_tasks = []
         
-    async def schedule_service_request(self, delay: float, endpoint: str, service: str):
+    async def schedule_service_request(self, delay: float, endpoint: Union[str, URL], service: str):
         """Schedule a service request for later execution"""
         await asyncio.sleep(delay)
         await self.agent.request_service_via_http(endpoint, service)
         
+    async def schedule_many(self, jobs: List[Tuple[float, Union[str, URL], str]]):
+        """Run several (delay, endpoint, service) requests concurrently"""
+        tasks = [
+            asyncio.create_task(self.schedule_service_request(delay, endpoint, service))
+            for delay, endpoint, service in jobs
+        ]
+        self.scheduled_tasks.extend(tasks)
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                self.scheduled_tasks.remove(task)
+        
     async def run_demo_sequence(self):
         """Run a demonstration sequence"""
         self.agent.logger.info("🎬 Starting demo sequence...")
         
         # Wait a moment, then request a soda
-        await asyncio.sleep(2)
-        await self.agent.request_service_via_http(
-            "http://localhost:3001/api/dispense/soda", 
-            "soda"
-        )
+        await self.schedule_many([
+            (2, FRIDGE_SODA_URL, "soda")
+        ])
 
 # Main execution
 async def main():
@@ -350,10 +477,18 @@ async def main():
     print("===============================================================")
     
     # Start demo sequence
-    await task_manager.run_demo_sequence()
+    try:
+        await task_manager.run_demo_sequence()
+    finally:
+        await homehub_agent.close()
     
     print("\n🏁 Demo sequence completed. Agent is now in standby mode.")
     print("💡 In a real implementation, this would run autonomously 24/7")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -6,12 +6,12 @@ echo "==============================================================="
 echo "🐍 Setting up Python Agent Development Kit (ADK)"
 echo "==============================================================="
 
-# Check if Python 3.8+ is available
+# Check if Python 3.11+ is available (asyncio.TaskGroup)
 python_version=$(python3 -c "import sys; print(f'{sys.version_info.major}.{sys.version_info.minor}')")
 echo "📋 Python version: $python_version"
 
-if (( $(echo "$python_version < 3.8" | bc -l) )); then
-    echo "❌ Python 3.8+ required. Please upgrade your Python installation."
+if ! python3 -c "import sys; sys.exit(sys.version_info < (3, 11))"; then
+    echo "❌ Python 3.11+ required. Please upgrade your Python installation."
     exit 1
 fi
 
@@ -6,8 +6,6 @@ This demonstrates the full workflow without requiring real blockchain credential
 
 import asyncio
 import os
-import json
-from datetime import datetime
 
 # Set simulation environment variables
 os.environ['SIMULATION_MODE'] = 'true'
@@ -59,7 +57,7 @@ async def simulation_demo():
     payment_info = payment_response.content.get('payment_info', {})
     price = payment_info.get('price', 0.1)
     
-    decision = await homehub_agent.ai_service.should_purchase('soda', price)
+    decision = homehub_agent.ai_service.should_purchase('soda', price)
     print(f"🤖 AI Decision: {decision['reasoning']}")
     
     if decision['decision']:
@@ -91,7 +89,7 @@ async def simulation_demo():
             print(f"🥤 Service delivered: {service_response.content.get('status', 'Soda dispensed!')}")
             
             # Step 5: HomeHub celebrates success
-            success_msg = await homehub_agent.ai_service.generate_success_message('soda')
+            success_msg = homehub_agent.ai_service.generate_success_message('soda')
             print(f"🎉 HomeHub: {success_msg}")
             
     print("\n" + "=" * 60)
@@ -100,4 +98,9 @@ async def simulation_demo():
     print("💡 Both agents operated autonomously using AI decision-making")
 
 if __name__ == "__main__":
-    asyncio.run(simulation_demo())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(simulation_demo())
+    else:
+        uvloop.run(simulation_demo())
\ No newline at end of file
@@ -5,8 +5,6 @@ Test script to demonstrate the Python ADK agents working
 
 import asyncio
 import aiohttp
-import json
-from datetime import datetime
 
 async def test_agents():
     """Test both Python ADK agents"""
@@ -93,4 +91,9 @@ async def test_agents():
     print("🚀 Your Python ADK agents are fully functional!")
 
 if __name__ == "__main__":
-    asyncio.run(test_agents())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(test_agents())
+    else:
+        uvloop.run(test_agents())
\ No newline at end of file